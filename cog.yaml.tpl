@@ -7,8 +7,6 @@ build:
   python_requirements: "requirements.txt"
   system_packages:
     - "curl"
-  run:
-    - "curl -o /usr/local/bin/pget -L 'https://github.com/replicate/pget/releases/latest/download/pget_linux_x86_64' && chmod +x /usr/local/bin/pget"
 predict: "predict.py:$PREDICTOR"
 concurrency:
   max: 16
@@ -3,8 +3,14 @@ from .download import download_file
 from .exceptions import check_for_prediction_error, exception_without_traceback
 from .images import async_validate_image_aspect_ratio, optimized_base64, optimized_file
 from .moderation import ContentModerationError, OpenAIModerationClient
-from .utils import seed_or_random_seed, validate_url, validate_uuid
-from .utils.gcp import ReplicateGCPBucket
+from .utils import (
+    ValidatedUrl,
+    seed_or_random_seed,
+    validate_url,
+    validate_urls,
+    validate_uuid,
+)
+from .utils.gcp import ReplicateGCPBucket, get_bucket
 from .utils.retry import (
     retry_with_capped_exponential_backoff,
     retry_with_exponential_backoff,
@@ -34,11 +40,14 @@ __all__ = [
     # download
     "download_file",
     # utils
+    "ValidatedUrl",
     "validate_url",
+    "validate_urls",
     "validate_uuid",
     "seed_or_random_seed",
     # gcp
     "ReplicateGCPBucket",
+    "get_bucket",
     # retry
     "retry_with_capped_exponential_backoff",
     "retry_with_exponential_backoff",
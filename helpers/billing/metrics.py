@@ -6,35 +6,43 @@ warnings.filterwarnings("ignore", category=ExperimentalFeatureWarning)
 
 # https://github.com/replicate/web/blob/main/replicate_web/metronome.py#L48-L65
 # https://github.com/replicate/director/blob/fc47af0457a1eead08a2f6574ee06eb75c7f6c43/cog/types.go#L64
-INTEGER_METRICS = {
-    "audio_output_count",
-    "character_input_count",
-    "character_output_count",
-    "generic_output_count",
-    "image_output_count",
-    "token_input_count",
-    "token_output_count",
-    "training_step_count",
-    "video_output_count",
-    "video_output_total_pixel_count",
-}
+INTEGER_METRICS = frozenset(
+    {
+        "audio_output_count",
+        "character_input_count",
+        "character_output_count",
+        "generic_output_count",
+        "image_output_count",
+        "token_input_count",
+        "token_output_count",
+        "training_step_count",
+        "video_output_count",
+        "video_output_total_pixel_count",
+    }
+)
 
-FLOAT_METRICS = {
-    "audio_output_duration_seconds",
-    "unspecified_billing_metric",
-    "video_output_duration_seconds",
-}
+FLOAT_METRICS = frozenset(
+    {
+        "audio_output_duration_seconds",
+        "unspecified_billing_metric",
+        "video_output_duration_seconds",
+    }
+)
 
-STRING_METRICS = {
-    "model_variant",
-    "motion_mode",
-    "resolution_target",
-    "resolution_upscale_target",
-}
+STRING_METRICS = frozenset(
+    {
+        "model_variant",
+        "motion_mode",
+        "resolution_target",
+        "resolution_upscale_target",
+    }
+)
 
-BOOL_METRICS = {
-    "with_audio",
-}
+BOOL_METRICS = frozenset(
+    {
+        "with_audio",
+    }
+)
 
 ALL_METRICS = INTEGER_METRICS | FLOAT_METRICS | STRING_METRICS | BOOL_METRICS
 
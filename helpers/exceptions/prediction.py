@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 from contextlib import contextmanager
 from enum import Enum
@@ -91,6 +92,13 @@ ERROR_PATTERNS = {
     ],
 }
 
+# One alternation per error code, checked in ERROR_PATTERNS order so the first
+# matching code still wins
+_ERROR_CLASSIFIERS = [
+    (error_code, re.compile("|".join(map(re.escape, patterns))))
+    for error_code, patterns in ERROR_PATTERNS.items()
+]
+
 
 def exception_without_traceback(error: Exception) -> Never:
     with disable_exception_traceback():
@@ -126,8 +134,8 @@ def check_for_prediction_error(error: Exception) -> Never:
 
     error_message = str(error).lower()
 
-    for error_code, patterns in ERROR_PATTERNS.items():
-        if any(term in error_message for term in patterns):
+    for error_code, classifier in _ERROR_CLASSIFIERS:
+        if classifier.search(error_message):
             exception_without_traceback(ModelError(error_code))
 
     exception_without_traceback(error)
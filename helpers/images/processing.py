@@ -1,10 +1,12 @@
 import asyncio
-import base64
 import io
 import tempfile
+from functools import lru_cache
 from pathlib import Path
+from typing import IO, Callable
 
 import pillow_avif  # noqa: F401
+import pybase64
 from pi_heif import register_heif_opener
 from PIL import Image
 
@@ -13,6 +15,7 @@ from helpers import exception_without_traceback
 UNSUPPORTED_JPEG_MODES = ["RGBA", "P"]
 MIN_ASPECT_RATIO = 0.4  # 1:2.5
 MAX_ASPECT_RATIO = 2.5  # 2.5:1
+BASE64_CACHE_SIZE = 32
 
 register_heif_opener()
 
@@ -85,6 +88,32 @@ def clear_image_metadata(img: Image.Image) -> Image.Image:
     return img
 
 
+# mtime_ns is only part of the cache key, so edited files are re-encoded
+@lru_cache(maxsize=BASE64_CACHE_SIZE)
+def _encode_base64(
+    image_path: str,
+    mtime_ns: int,  # noqa: ARG001
+    img_format: str,
+    quality: int,
+    max_dim: int,
+    raw: bool,
+) -> str:
+    img = resize_image(image_path, max_dim)
+    if img_format.lower() in ["jpg", "jpeg"]:
+        img = convert_to_supported_jpeg_mode(img)
+        img_format = "JPEG"
+
+    buffer = io.BytesIO()
+    img = clear_image_metadata(img)
+    img.save(buffer, format=img_format.upper(), quality=quality)
+
+    img_base64 = pybase64.b64encode(buffer.getbuffer()).decode("utf-8")
+
+    if raw:
+        return img_base64
+    return f"data:image/{img_format.lower()};base64,{img_base64}"
+
+
 def save_to_base64(
     image_path: Path,
     img_format: str = "jpeg",
@@ -95,6 +124,9 @@ def save_to_base64(
     """
     Save an image to base64 string with optimization.
 
+    Results are cached per file and modification time, so retries with the
+    same image skip re-encoding.
+
     Args:
         image_path: Path to the image file
         img_format: Image format (jpeg, png, etc.)
@@ -105,21 +137,8 @@ def save_to_base64(
     Returns:
         Base64 encoded image string
     """
-    img = resize_image(image_path, max_dim)
-    if img_format.lower() in ["jpg", "jpeg"]:
-        img = convert_to_supported_jpeg_mode(img)
-        img_format = "JPEG"
-
-    buffer = io.BytesIO()
-    img = clear_image_metadata(img)
-    img.save(buffer, format=img_format.upper(), quality=quality)
-    buffer.seek(0)
-
-    img_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-
-    if raw:
-        return img_base64
-    return f"data:image/{img_format.lower()};base64,{img_base64}"
+    mtime_ns = Path(image_path).stat().st_mtime_ns
+    return _encode_base64(str(image_path), mtime_ns, img_format, quality, max_dim, raw)
 
 
 def crop_image_to_aspect_ratio(
@@ -172,35 +191,36 @@ def validate_image_aspect_ratio(
     crop_to_aspect_ratio: bool = False,
 ) -> None:
     try:
-        img = Image.open(image_path)
-        width, height = img.size
+        # Image.open only parses the header; pixels are decoded only if we crop
+        with Image.open(image_path) as img:
+            width, height = img.size
 
-        if height == 0:
-            exception_without_traceback(
-                ValueError(f"Image {image_path} has zero height, which is invalid.")
-            )
+            if height == 0:
+                exception_without_traceback(
+                    ValueError(f"Image {image_path} has zero height, which is invalid.")
+                )
 
-        current_ar = width / height
+            current_ar = width / height
 
-        if not (min_aspect_ratio <= current_ar <= max_aspect_ratio):
-            if crop_to_aspect_ratio:
-                cropped_img = crop_image_to_aspect_ratio(
-                    img, min_aspect_ratio, max_aspect_ratio
-                )
-                # Only save if the image was actually changed
-                if cropped_img.size != img.size:
-                    print(
-                        f"Cropping image to be within aspect ratio range: {image_path} ({current_ar:.2f} -> {cropped_img.size[0] / cropped_img.size[1]:.2f})"
+            if not (min_aspect_ratio <= current_ar <= max_aspect_ratio):
+                if crop_to_aspect_ratio:
+                    cropped_img = crop_image_to_aspect_ratio(
+                        img, min_aspect_ratio, max_aspect_ratio
+                    )
+                    # Only save if the image was actually changed
+                    if cropped_img.size != img.size:
+                        print(
+                            f"Cropping image to be within aspect ratio range: {image_path} ({current_ar:.2f} -> {cropped_img.size[0] / cropped_img.size[1]:.2f})"
+                        )
+                        cropped_img.save(image_path)
+                    return
+                exception_without_traceback(
+                    ValueError(
+                        f"Image aspect ratio ({current_ar:.2f}) is outside the allowed range "
+                        f"[{min_aspect_ratio:.2f} (1:{1 / min_aspect_ratio:.1f}), {max_aspect_ratio:.2f} ({max_aspect_ratio:.1f}:1)]. "
+                        f"{aspect_ratio_error_message}"
                     )
-                    cropped_img.save(image_path)
-                return
-            exception_without_traceback(
-                ValueError(
-                    f"Image aspect ratio ({current_ar:.2f}) is outside the allowed range "
-                    f"[{min_aspect_ratio:.2f} (1:{1 / min_aspect_ratio:.1f}), {max_aspect_ratio:.2f} ({max_aspect_ratio:.1f}:1)]. "
-                    f"{aspect_ratio_error_message}"
                 )
-            )
     except Exception as e:
         exception_without_traceback(
             ValueError(
@@ -214,6 +234,8 @@ def save_to_file(
     img_format: str = "jpeg",
     quality: int = 80,
     max_dim: int = 1024,
+    *,
+    tmp_factory: Callable[..., IO] = tempfile.NamedTemporaryFile,
 ) -> Path:
     """
     Save an optimized image to a temporary file.
@@ -223,6 +245,7 @@ def save_to_file(
         img_format: Image format (jpeg, png, etc.)
         quality: JPEG quality (1-100)
         max_dim: Maximum dimension in pixels
+        tmp_factory: Creates the temporary file; called like NamedTemporaryFile
 
     Returns:
         Path to the temporary file
@@ -232,9 +255,7 @@ def save_to_file(
         img = convert_to_supported_jpeg_mode(img)
         img_format = "JPEG"
 
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=f".{img_format.lower()}"
-    ) as tmp:
+    with tmp_factory(delete=False, suffix=f".{img_format.lower()}") as tmp:
         img = clear_image_metadata(img)
         img.save(tmp.name, format=img_format.upper(), quality=quality)
         return Path(tmp.name)
@@ -270,6 +291,8 @@ async def optimized_file(
     img_format: str = "jpeg",
     quality: int = 80,
     max_dim: int = 1024,
+    *,
+    tmp_factory: Callable[..., IO] = tempfile.NamedTemporaryFile,
 ) -> Path:
     """
     Asynchronously save an optimized image to a temporary file.
@@ -279,12 +302,13 @@ async def optimized_file(
         img_format: Image format (jpeg, png, etc.)
         quality: JPEG quality (1-100)
         max_dim: Maximum dimension in pixels
+        tmp_factory: Creates the temporary file; called like NamedTemporaryFile
 
     Returns:
         Path to the temporary file
     """
     return await asyncio.to_thread(
-        save_to_file, image_path, img_format, quality, max_dim
+        save_to_file, image_path, img_format, quality, max_dim, tmp_factory=tmp_factory
     )
 
 
@@ -1,9 +1,12 @@
 import asyncio
+import contextlib
+import os
 import re
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Set, Tuple
 
-from openai import AsyncOpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
 from helpers.images.processing import optimized_base64
 
@@ -24,6 +27,86 @@ MODERATION_CATEGORIES = {
     "violence/graphic",
 }
 
+# Categories that, combined with "sexual", always block content
+_OTHER_CATEGORIES = frozenset(MODERATION_CATEGORIES - {"sexual", "sexual/minors"})
+
+_CHILD_RE = re.compile(r"\b(girl|boy)\b")
+
+_API_KEY_PATH = Path(".openai-api-key")
+_API_KEY = (
+    _API_KEY_PATH.read_text().strip()
+    if _API_KEY_PATH.exists()
+    else os.environ.get("OPENAI_API_KEY", "")
+)
+
+_shared_client: AsyncOpenAI | None = None
+_shared_loop: asyncio.AbstractEventLoop | None = None
+# Keeps close tasks for replaced clients alive until they finish
+_closing: Set[asyncio.Task] = set()
+
+
+async def _close_client(client: AsyncOpenAI) -> None:
+    # The client's loop may already be closed. Closing still releases its
+    # sockets, but the dead loop then raises RuntimeError
+    with contextlib.suppress(RuntimeError):
+        await client.close()
+
+
+def _get_shared_client() -> AsyncOpenAI:
+    """
+    Return the AsyncOpenAI client shared by all moderation clients.
+
+    Pooled connections belong to the event loop that opened them, so the
+    client is rebuilt (and the old one closed) when called from a different
+    loop. Must be called from a running event loop.
+    """
+    global _shared_client, _shared_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        raise RuntimeError(
+            "The moderation OpenAI client must be used from a running event loop"
+        ) from None
+    if _shared_client is None or _shared_loop is not loop:
+        if _shared_client is not None:
+            task = loop.create_task(_close_client(_shared_client))
+            _closing.add(task)
+            task.add_done_callback(_closing.discard)
+        _shared_client = AsyncOpenAI(
+            api_key=_API_KEY,
+            timeout=httpx.Timeout(10.0, connect=3.0),
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+            ),
+        )
+        _shared_loop = loop
+    return _shared_client
+
+
+def _with_flags(result: Dict) -> Tuple[Dict, Set[str]]:
+    flagged = {cat for cat, value in result["categories"].items() if value}
+    if flagged:
+        print(f"Flagged categories: {', '.join(sorted(flagged))}")
+    return result, flagged
+
+
+def _merge_results(results: List[Dict]) -> Dict:
+    """Combine per-text moderation results into a single result for one item."""
+    if len(results) == 1:
+        return results[0]
+
+    merged = dict(results[0])
+    merged["flagged"] = any(result["flagged"] for result in results)
+    merged["categories"] = {
+        cat: any(result["categories"].get(cat) for result in results)
+        for cat in results[0]["categories"]
+    }
+    merged["category_scores"] = {
+        cat: max(result["category_scores"].get(cat, 0.0) for result in results)
+        for cat in results[0]["category_scores"]
+    }
+    return merged
+
 
 class ContentModerationError(Exception):
     def __init__(self, message: str):
@@ -32,21 +115,32 @@ class ContentModerationError(Exception):
 
 class OpenAIModerationClient:
     def __init__(self):
-        api_key = (
-            Path(".openai-api-key").read_text().strip()
-            if Path(".openai-api-key").exists()
-            else ""
-        )
-        self.client = AsyncOpenAI(api_key=api_key)
         self.model = "omni-moderation-latest"
 
-    async def check_content(
+    @property
+    def client(self) -> AsyncOpenAI:
+        """The shared AsyncOpenAI client; only available inside a running loop."""
+        return _get_shared_client()
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close the shared OpenAI client and its connection pool."""
+        global _shared_client, _shared_loop
+        client, _shared_client, _shared_loop = _shared_client, None, None
+        if client is not None:
+            await _close_client(client)
+        loop = asyncio.get_running_loop()
+        pending = [task for task in _closing if task.get_loop() is loop]
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _check_content(
         self,
         texts: List[str] | None = None,
         image_url: str | None = None,
         image_path: Path | None = None,
         timeout: float = 10.0,
-    ) -> Dict:
+    ) -> Tuple[Dict, Set[str]]:
         input_data = []
         if texts:
             input_data.extend({"type": "text", "text": text} for text in texts)
@@ -61,32 +155,91 @@ class OpenAIModerationClient:
             timeout=timeout,
         )
 
-        flagged = [
-            cat
-            for cat in response.results[0].categories.__dict__
-            if getattr(response.results[0].categories, cat)
-        ]
-        if flagged:
-            print(f"Flagged categories: {', '.join(flagged)}")
+        return _with_flags(response.results[0].model_dump(by_alias=True))
 
-        return response.results[0].model_dump()
+    async def check_content(
+        self,
+        texts: List[str] | None = None,
+        image_url: str | None = None,
+        image_path: Path | None = None,
+        timeout: float = 10.0,
+    ) -> Dict:
+        result, _ = await self._check_content(
+            texts=texts,
+            image_url=image_url,
+            image_path=image_path,
+            timeout=timeout,
+        )
+        return result
 
-    async def check_multiple(
+    async def _check_multiple(
         self,
         content_list: List[Dict],
         timeout: float = 10.0,
-    ) -> List[Dict]:
+    ) -> List[Tuple[Dict, Set[str]] | BaseException]:
+        results: List[Tuple[Dict, Set[str]] | BaseException | None] = [None] * len(
+            content_list
+        )
+
+        # Text-only items are packed into one request with a string per text;
+        # items with an image need their own multi-modal request
+        input_data: List[str] = []
+        owners: List[int] = []
         tasks = []
-        for content in content_list:
-            task = self.check_content(
-                texts=content.get("texts"),
-                image_url=content.get("image_url"),
-                image_path=content.get("image_path"),
-                timeout=timeout,
+        task_indices = []
+        for i, content in enumerate(content_list):
+            texts = content.get("texts")
+            if texts and not content.get("image_url") and not content.get("image_path"):
+                input_data.extend(texts)
+                owners.extend([i] * len(texts))
+                continue
+
+            tasks.append(
+                self._check_content(
+                    texts=texts,
+                    image_url=content.get("image_url"),
+                    image_path=content.get("image_path"),
+                    timeout=timeout,
+                )
             )
-            tasks.append(task)
+            task_indices.append(i)
+
+        async def check_texts() -> None:
+            try:
+                response = await asyncio.wait_for(
+                    self.client.moderations.create(model=self.model, input=input_data),
+                    timeout=timeout,
+                )
+                grouped: Dict[int, List[Dict]] = {}
+                for owner, result in zip(owners, response.results):
+                    grouped.setdefault(owner, []).append(
+                        result.model_dump(by_alias=True)
+                    )
+                for i in set(owners):
+                    results[i] = _with_flags(_merge_results(grouped[i]))
+            except Exception as e:
+                for i in set(owners):
+                    results[i] = e
+
+        if input_data:
+            tasks.append(check_texts())
+
+        task_results = await asyncio.gather(*tasks, return_exceptions=True)
+        for i, result in zip(task_indices, task_results):
+            results[i] = result
 
-        return await asyncio.gather(*tasks, return_exceptions=True)
+        return results
+
+    async def check_multiple(
+        self,
+        content_list: List[Dict],
+        timeout: float = 10.0,
+    ) -> List[Dict]:
+        results = await self._check_multiple(content_list=content_list, timeout=timeout)
+        return [
+            result if isinstance(result, BaseException) else result[0]
+            for result in results
+        ]
 
     async def raise_if_flagged(
         self,
@@ -95,7 +248,8 @@ class OpenAIModerationClient:
         timeout: float = 10.0,
         substitute_child_terms: bool = False,
     ) -> None:
-        invalid_types = set(types) - MODERATION_CATEGORIES
+        valid_types = frozenset(types) & MODERATION_CATEGORIES
+        invalid_types = set(types) - valid_types
         if invalid_types:
             print(f"Invalid moderation types: {invalid_types}")
             print(f"Valid types are: {sorted(MODERATION_CATEGORIES)}")
@@ -103,60 +257,45 @@ class OpenAIModerationClient:
         # Apply text substitution if enabled
         if substitute_child_terms:
             for content in content_list:
-                if "texts" in content and content["texts"]:
+                texts = content.get("texts")
+                if texts and any(_CHILD_RE.search(text) for text in texts):
                     content["texts"] = [
-                        re.sub(r"\b(girl)\b", r"\1 (child)", text)
-                        for text in content["texts"]
-                    ]
-                    content["texts"] = [
-                        re.sub(r"\b(boy)\b", r"\1 (child)", text)
-                        for text in content["texts"]
+                        _CHILD_RE.sub(r"\1 (child)", text) for text in texts
                     ]
 
         try:
-            results = await self.check_multiple(
+            results = await self._check_multiple(
                 content_list=content_list,
                 timeout=timeout,
             )
+        except asyncio.TimeoutError:
+            print("Warning: Moderation timed out")
+            return
+        except Exception:
+            print("Warning: Moderation check failed")
+            return
 
-            for result in results:
-                if isinstance(result, Exception):
-                    print(f"Warning: Moderation check failed: {result}")
-                    continue
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Warning: Moderation check failed: {result}")
+                continue
 
-                if result["categories"].get("sexual/minors", False):
-                    raise ContentModerationError(
-                        "Content flagged and reported for containing illegal material"
-                    )
+            _, flagged = result
 
-                # Check if content is both sexual and has any other flag
-                is_sexual = result["categories"].get("sexual", False)
-                has_other_flag = any(
-                    result["categories"].get(cat, False)
-                    for cat in MODERATION_CATEGORIES
-                    if cat not in ["sexual", "sexual/minors"]
+            if "sexual/minors" in flagged:
+                raise ContentModerationError(
+                    "Content flagged and reported for containing illegal material"
                 )
-                if is_sexual and has_other_flag:
-                    raise ContentModerationError(
-                        "Content flagged for containing sexual content with other violations"
-                    )
 
-                flagged_types = []
-                for check_type in types:
-                    if check_type in MODERATION_CATEGORIES and result["categories"].get(
-                        check_type, False
-                    ):
-                        flagged_types.append(check_type)
+            # Check if content is both sexual and has any other flag
+            if "sexual" in flagged and flagged & _OTHER_CATEGORIES:
+                raise ContentModerationError(
+                    "Content flagged for containing sexual content with other violations"
+                )
 
-                if flagged_types:
-                    raise ContentModerationError(
-                        f"Content flagged for: {', '.join(flagged_types)}"
-                    )
+            flagged_types = sorted(flagged & valid_types)
 
-        except (asyncio.TimeoutError, Exception) as e:
-            if isinstance(e, ContentModerationError):
-                raise e from None
-            if isinstance(e, asyncio.TimeoutError):
-                print("Warning: Moderation timed out")
-            else:
-                print("Warning: Moderation check failed")
+            if flagged_types:
+                raise ContentModerationError(
+                    f"Content flagged for: {', '.join(flagged_types)}"
+                )
@@ -1,18 +1,21 @@
-from .gcp import ReplicateGCPBucket
+from .gcp import ReplicateGCPBucket, get_bucket
 from .random_utils import seed_or_random_seed
 from .retry import (
     retry_with_capped_exponential_backoff,
     retry_with_exponential_backoff,
     retry_with_uniform_backoff,
 )
-from .validation import validate_url, validate_uuid
+from .validation import ValidatedUrl, validate_url, validate_urls, validate_uuid
 
 __all__ = [
+    "ValidatedUrl",
     "validate_url",
+    "validate_urls",
     "validate_uuid",
     "seed_or_random_seed",
     "retry_with_exponential_backoff",
     "retry_with_uniform_backoff",
     "retry_with_capped_exponential_backoff",
     "ReplicateGCPBucket",
+    "get_bucket",
 ]
@@ -1,54 +1,146 @@
 import asyncio
 import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 from google.cloud import storage
 
 DEFAULT_SERVICE_ACCOUNT = "r8-proxy-models-input-us@replicate.iam.gserviceaccount.com"
 DEFAULT_BUCKET = "replicate-proxy-models-input-us"
 GOOGLE_APPLICATION_CREDENTIALS = Path(".gcp-service-account.json")
+_CREDENTIALS_PATH = str(GOOGLE_APPLICATION_CREDENTIALS.resolve())
+
+MAX_CONCURRENT_UPLOADS = 8
+# Signed URLs are reused for at most this long, and never past half their lifetime
+SIGNED_URL_REUSE_SECONDS = 60
+SIGNED_URL_CACHE_SIZE = 1024
+
+# Shared by all buckets so concurrent uploads stay bounded process-wide
+_upload_executor = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_UPLOADS, thread_name_prefix="gcp-upload"
+)
+
+_client: Optional[storage.Client] = None
+_bucket: Optional["ReplicateGCPBucket"] = None
+_init_lock = threading.RLock()
+
+
+def _get_storage_client() -> storage.Client:
+    # Created on first use so importing helpers doesn't require GCP credentials
+    global _client
+    with _init_lock:
+        if _client is None:
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = _CREDENTIALS_PATH
+            _client = storage.Client()
+        return _client
+
+
+def get_bucket() -> "ReplicateGCPBucket":
+    """Return a ReplicateGCPBucket shared across the process."""
+    global _bucket
+    with _init_lock:
+        if _bucket is None:
+            _bucket = ReplicateGCPBucket()
+        return _bucket
 
 
 class ReplicateGCPBucket:
     def __init__(self):
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(
-            GOOGLE_APPLICATION_CREDENTIALS.resolve()
-        )
         self.service_account = DEFAULT_SERVICE_ACCOUNT
         self.bucket_name = DEFAULT_BUCKET
-        self.client = storage.Client()
+        self.client = _get_storage_client()
+        self.bucket = self.client.bucket(self.bucket_name)
+        self._signed_urls: OrderedDict[Tuple[str, timedelta], Tuple[str, float]] = (
+            OrderedDict()
+        )
+        self._signed_urls_lock = threading.Lock()
 
-    def upload_raw(self, local_path: str, blob_name: str) -> None:
-        bucket = self.client.bucket(self.bucket_name)
-        blob = bucket.blob(blob_name)
+    def _upload_blob(
+        self,
+        local_path: str,
+        blob: storage.Blob,
+        if_generation_match: Optional[int] = None,
+    ) -> None:
         try:
-            blob.upload_from_filename(local_path)
+            blob.upload_from_filename(
+                local_path, if_generation_match=if_generation_match
+            )
         except Exception:
             raise Exception(f"Failed to upload {local_path}")
 
-    def get_signed_url(
-        self, blob_name: str, expiration: timedelta = timedelta(minutes=15)
-    ) -> str:
-        bucket = self.client.bucket(self.bucket_name)
-        blob = bucket.blob(blob_name)
-        return blob.generate_signed_url(
+    def _sign_blob(self, blob: storage.Blob, expiration: timedelta) -> str:
+        key = (blob.name, expiration)
+        now = time.monotonic()
+        with self._signed_urls_lock:
+            cached = self._signed_urls.get(key)
+            if cached is not None and cached[1] > now:
+                self._signed_urls.move_to_end(key)
+                return cached[0]
+
+        url = blob.generate_signed_url(
             version="v4",
             method="GET",
             expiration=expiration,
             service_account_email=self.service_account,
         )
+        reuse_for = min(SIGNED_URL_REUSE_SECONDS, expiration.total_seconds() / 2)
+        with self._signed_urls_lock:
+            self._signed_urls[key] = (url, now + reuse_for)
+            self._signed_urls.move_to_end(key)
+            if len(self._signed_urls) > SIGNED_URL_CACHE_SIZE:
+                self._signed_urls.popitem(last=False)
+        return url
+
+    def upload_raw(self, local_path: str, blob_name: str) -> None:
+        self._upload_blob(local_path, self.bucket.blob(blob_name))
+
+    def get_signed_url(
+        self, blob_name: str, expiration: timedelta = timedelta(minutes=15)
+    ) -> str:
+        return self._sign_blob(self.bucket.blob(blob_name), expiration)
+
+    def _upload_and_sign(
+        self,
+        local_path: str,
+        blob_name: str,
+        expiration: timedelta,
+        if_generation_match: Optional[int] = None,
+    ) -> str:
+        blob = self.bucket.blob(blob_name)
+        self._upload_blob(local_path, blob, if_generation_match)
+        return self._sign_blob(blob, expiration)
 
     def _upload_file_sync(
         self, file_path: Path, expiration: timedelta = timedelta(minutes=15)
     ) -> str:
         unique_id = uuid.uuid4().hex
         blob_name = f"{unique_id}_{file_path.name}"
-        self.upload_raw(str(file_path), blob_name)
-        return self.get_signed_url(blob_name, expiration)
+        # The uuid name never exists yet, so requiring generation 0 makes the
+        # upload safe for the client's built-in retry
+        return self._upload_and_sign(
+            str(file_path), blob_name, expiration, if_generation_match=0
+        )
 
     async def upload_file(
         self, file_path: Path, expiration: timedelta = timedelta(minutes=15)
     ) -> str:
         return await asyncio.to_thread(self._upload_file_sync, file_path, expiration)
+
+    async def upload_files(
+        self, file_paths: List[Path], expiration: timedelta = timedelta(minutes=15)
+    ) -> List[str]:
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    _upload_executor, self._upload_file_sync, file_path, expiration
+                )
+                for file_path in file_paths
+            )
+        )
@@ -1,10 +1,15 @@
 import os
 
+MAX_SEED = 0x7FFFFFFF  # 2147483647
+
+
+def _random_seed() -> int:
+    # A masked draw of 0 falls back to 1 so the result is always in [1, MAX_SEED]
+    return (int.from_bytes(os.urandom(4), "big") & MAX_SEED) or 1
+
 
 def seed_or_random_seed(seed: int | None) -> int:
-    # Max seed is 2147483647
-    if seed is None or seed <= 0:
-        seed = int.from_bytes(os.urandom(4), "big") & 0x7FFFFFFF
+    seed = seed if seed is not None and seed > 0 else _random_seed()
 
     print(f"Using seed: {seed}")
     return seed
@@ -9,6 +9,17 @@ class RetryType(Enum):
     CAPPED_EXPONENTIAL = auto()
 
 
+# Delays below this are shorter than the event loop's timer resolution
+MIN_SLEEP_SECONDS = 1e-3
+
+# Delay for each retry type, given (retry_count, base_delay, max_delay, jitter)
+_STRATEGIES = {
+    RetryType.EXPONENTIAL: lambda rc, bd, _md, j: bd * (2**rc) * j,
+    RetryType.UNIFORM: lambda _rc, bd, _md, j: bd * j,
+    RetryType.CAPPED_EXPONENTIAL: lambda rc, bd, md, j: min(bd * (2**rc) * j, md),
+}
+
+
 async def retry(
     retry_count: int,
     max_retries: int,
@@ -25,16 +36,14 @@ async def retry(
         raise ValueError("max_delay is required for CAPPED_EXPONENTIAL retry type")
 
     jitter = random.uniform(0.8, 1.2)
-
-    if retry_type == RetryType.EXPONENTIAL:
-        delay = base_delay * (2**retry_count) * jitter
-    elif retry_type == RetryType.UNIFORM:
-        delay = base_delay * jitter
-    else:  # CAPPED_EXPONENTIAL
-        delay = min(base_delay * (2**retry_count) * jitter, max_delay)
+    delay = _STRATEGIES[retry_type](retry_count, base_delay, max_delay, jitter)
 
     print(f"{error_type}. Checking again in {delay:.1f} seconds...")
-    await asyncio.sleep(delay)
+    if delay >= MIN_SLEEP_SECONDS:
+        await asyncio.sleep(delay)
+    elif delay > 0:
+        # Yield to the loop without scheduling a timer
+        await asyncio.sleep(0)
     return True, retry_count + 1
 
 
@@ -1,21 +1,78 @@
 import uuid
+from functools import lru_cache
+from typing import Iterable
+from urllib.parse import urlsplit
 
 import httpx
 
+URL_CACHE_SIZE = 1024
 
-def validate_url(url_label: str, url: str | None) -> None:
-    if not url:
-        return
+_SCHEME_ERROR = "must start with http:// or https://"
+# Characters that end an empty authority straight after the scheme
+_AUTHORITY_END = frozenset("/?#")
+# str.translate table that deletes ASCII control characters (0x00-0x1f, 0x7f)
+_DELETE_CONTROL_CHARS = dict.fromkeys([*range(0x20), 0x7F])
+
+
+class ValidatedUrl(str):
+    """A URL that has already passed validate_url."""
+
+    __slots__ = ()
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def _url_error(url: str) -> str | None:
+    """Return why url is not a valid http(s) URL, or None if it is."""
+    # Compare fixed-length prefixes and remember where the authority starts
+    if url[:8] == "https://":
+        authority_start = 8
+    elif url[:7] == "http://":
+        authority_start = 7
+    else:
+        return _SCHEME_ERROR
 
-    if not url.startswith(("http://", "https://")):
-        raise ValueError(f"{url_label} must start with http:// or https://")
+    if len(url.translate(_DELETE_CONTROL_CHARS)) != len(url):
+        return "Invalid non-printable ASCII character in URL"
+
+    # An empty authority ("http://", "http:///path") has no host; reject it
+    # without handing the URL to the full parser
+    if len(url) == authority_start or url[authority_start] in _AUTHORITY_END:
+        return "Invalid URL format"
 
     try:
-        parsed = httpx.URL(url)
-        if not parsed.host:
-            raise ValueError("Invalid URL format")
+        parts = urlsplit(url)
+        # Reading .port validates it (non-numeric or out of range raises)
+        parts.port
+        # httpx fetches these URLs, so its IDNA host check must pass too;
+        # urlsplit alone accepts hosts httpx rejects. Misses only: results
+        # are cached by _url_error
+        host = httpx.URL(url).host
     except Exception as e:
-        raise ValueError(f"Invalid {url_label} format: {str(e)}")
+        return str(e)
+    if not parts.hostname or not host:
+        return "Invalid URL format"
+    return None
+
+
+def validate_url(url_label: str, url: str | None) -> ValidatedUrl | None:
+    if not url:
+        return None
+    if isinstance(url, ValidatedUrl):
+        return url
+
+    # Errors are cached as messages, so invalid URLs still raise on every call
+    error = _url_error(url)
+    if error is None:
+        return ValidatedUrl(url)
+    if error == _SCHEME_ERROR:
+        raise ValueError(f"{url_label} {error}")
+    raise ValueError(f"Invalid {url_label} format: {error}")
+
+
+def validate_urls(url_label: str, urls: Iterable[str | None]) -> None:
+    # Raises for the first invalid URL; repeats hit the _url_error cache
+    for url in urls:
+        validate_url(url_label, url)
 
 
 def validate_uuid(uuid_type: str, uuid_str: str | None):
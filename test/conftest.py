@@ -0,0 +1,60 @@
+"""Shared pytest configuration."""
+
+import os
+import shutil
+from functools import lru_cache
+
+import pytest
+from PIL import Image
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-network",
+        action="store_true",
+        default=False,
+        help="Run tests that download remote fixtures",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-network"):
+        return
+    skip_network = pytest.mark.skip(reason="needs --run-network to run")
+    for item in items:
+        if "network" in item.keywords:
+            item.add_marker(skip_network)
+
+
+@pytest.fixture(scope="session")
+def encoded_jpeg(tmp_path_factory):
+    """Encode each solid-color JPEG once per session and return its path."""
+    fixture_dir = tmp_path_factory.mktemp("fixtures")
+
+    @lru_cache(maxsize=None)
+    def encode(size, color):
+        path = fixture_dir / f"{size[0]}x{size[1]}-{color}.jpg"
+        Image.new("RGB", size, color=color).save(path, format="JPEG")
+        return path
+
+    return encode
+
+
+@pytest.fixture
+def make_jpeg(tmp_path, encoded_jpeg):
+    """Place a cached JPEG at tmp_path / name without re-encoding it.
+
+    The file is a hardlink to the session copy, so tests that modify it must
+    write a new file and replace it rather than writing in place.
+    """
+
+    def make(name, size, color):
+        src = encoded_jpeg(size, color)
+        dest = tmp_path / name
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+        return dest
+
+    return make
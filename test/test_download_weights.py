@@ -0,0 +1,111 @@
+"""Tests for the ranged model weight downloader."""
+
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+import predict
+
+DATA = os.urandom(4500)
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d+)")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves DATA, honouring Range unless the server is told otherwise."""
+
+    def log_message(self, *_):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        if self.server.send_length:
+            self.send_header("Content-Length", str(len(DATA)))
+        self.end_headers()
+
+    def do_GET(self):
+        match = _RANGE_RE.fullmatch(self.headers.get("Range", ""))
+        if match and self.server.honour_ranges:
+            start, end = int(match[1]), int(match[2])
+            with self.server.lock:
+                self.server.ranges.append((start, end))
+                fail = start in self.server.fail_once
+                self.server.fail_once.discard(start)
+            body = DATA[start : end + 1]
+            if fail:
+                # Promise the full range but cut the body short
+                body = body[: len(body) // 2]
+            self.send_response(206)
+            self.send_header("Content-Length", str(end - start + 1))
+        else:
+            body = DATA
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.send_length = True
+    httpd.honour_ranges = True
+    httpd.fail_once = set()
+    httpd.ranges = []
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def download(server, tmp_path):
+    """Download DATA from the test server and return the written bytes."""
+
+    def run():
+        dest = tmp_path / "weights.bin"
+        url = f"http://127.0.0.1:{server.server_port}/weights.bin"
+        with patch.object(predict, "DOWNLOAD_RANGE_SIZE", 1000), patch.object(
+            predict, "DOWNLOAD_CHUNK_SIZE", 256
+        ), patch.object(predict, "DOWNLOAD_RETRY_DELAY", 0):
+            predict.download_weights(url, str(dest))
+        return dest.read_bytes()
+
+    return run
+
+
+def test_download_weights_assembles_ranges(server, download):
+    """Test that ranges, including the short last one, land at their offsets."""
+    assert download() == DATA
+    assert sorted(server.ranges) == [
+        (0, 999),
+        (1000, 1999),
+        (2000, 2999),
+        (3000, 3999),
+        (4000, 4499),
+    ]
+
+
+def test_download_weights_retries_short_range(server, download):
+    """Test that a truncated range is fetched again."""
+    server.fail_once = {2000}
+    assert download() == DATA
+    assert server.ranges.count((2000, 2999)) == 2
+
+
+def test_download_weights_without_content_length(server, download):
+    """Test falling back to one streamed GET when HEAD has no length."""
+    server.send_length = False
+    assert download() == DATA
+    assert server.ranges == []
+
+
+def test_download_weights_server_ignores_ranges(server, download):
+    """Test that a full-body reply to the first range completes the download."""
+    server.honour_ranges = False
+    assert download() == DATA
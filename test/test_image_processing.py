@@ -1,8 +1,12 @@
 """Tests for image processing functionality."""
 
 import base64
+import os
+import re
+import shutil
 import tempfile
-from unittest.mock import patch
+from functools import partial
+from pathlib import Path
 
 import pytest
 import requests
@@ -19,45 +23,94 @@ from helpers.images.processing import (
     validate_image_aspect_ratio,
 )
 
+DOWNLOAD_CACHE_DIR = Path.home() / ".cache" / "cog-clip-tests"
+
+HEIC_URL = "https://replicate.delivery/pbxt/NM8ePjxU47T9cqMHFQ7xAE0Yih72FiXShCo5G8dJzq9CLLYT/IMG_1845.HEIC"
+AVIF_URL = "https://replicate.delivery/pbxt/NM8fUF5vdinBEBweWzwD5d94VqclSsOuYSsuqjWOiLJnLlHH/titanic.avif"
+
+
+def _cached_download(url):
+    """Download url into the local test cache once and return its path."""
+    path = DOWNLOAD_CACHE_DIR / url.rsplit("/", 1)[-1]
+    if not path.exists():
+        DOWNLOAD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        part_path = path.with_name(path.name + ".part")
+        with requests.get(url, stream=True, timeout=30) as resp:
+            resp.raise_for_status()
+            with part_path.open("wb") as f:
+                shutil.copyfileobj(resp.raw, f)
+        part_path.replace(path)
+    return path
+
+
+_ALLOWED_RANGE = r"the allowed range \[0\.40 \(1:2\.5\), 2\.50 \(2\.5:1\)\]"
+_ASPECT_PREFIX = r"Error processing image .* for aspect ratio validation: "
+_CUSTOM_ASPECT_MESSAGE = "Please use a more square image"
+_ASPECT_TOO_WIDE = re.compile(
+    _ASPECT_PREFIX + r"Image aspect ratio \(2\.63\) is outside " + _ALLOWED_RANGE,
+    re.DOTALL,
+)
+_ASPECT_TOO_TALL = re.compile(
+    _ASPECT_PREFIX + r"Image aspect ratio \(0\.38\) is outside " + _ALLOWED_RANGE,
+    re.DOTALL,
+)
+_ASPECT_TOO_WIDE_CUSTOM = re.compile(
+    _ASPECT_TOO_WIDE.pattern + r"\. " + re.escape(_CUSTOM_ASPECT_MESSAGE),
+    re.DOTALL,
+)
+_ASPECT_MISSING_FILE = re.compile(
+    _ASPECT_PREFIX + r".*No such file or directory", re.DOTALL
+)
+_PROCESSING_ERROR = re.compile(r"Error processing image")
+
 
 @pytest.fixture
 def test_image_rgb():
+    # Function-scoped: test_clear_image_metadata mutates its info dict
     return Image.new("RGB", (800, 600), color="red")
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def test_image_rgba():
     return Image.new("RGBA", (800, 600), color=(255, 0, 0, 128))
 
 
+@pytest.fixture(scope="session")
+def invalid_image_path(tmp_path_factory):
+    """A .jpg file that PIL cannot identify as an image."""
+    path = tmp_path_factory.mktemp("invalid") / "invalid.jpg"
+    path.write_bytes(b"\x00")
+    return path
+
+
+@pytest.fixture(scope="session")
+def heic_path():
+    return _cached_download(HEIC_URL)
+
+
+@pytest.fixture(scope="session")
+def avif_path():
+    return _cached_download(AVIF_URL)
+
+
 @pytest.fixture
-def test_image_path(tmp_path, test_image_rgb):
+def test_image_path(make_jpeg):
     """Create a temporary test image file."""
-    img_path = tmp_path / "test.jpg"
-    test_image_rgb.save(img_path, format="JPEG")
-    return img_path
+    return make_jpeg("test.jpg", (800, 600), "red")
 
 
 @pytest.fixture
-def wide_image_path(tmp_path):
+def wide_image_path(make_jpeg):
     """Create a temporary wide test image file."""
-    img = Image.new(
-        "RGB", (1000, 380), color="blue"
-    )  # 2.63:1 ratio, outside max of 2.5:1
-    img_path = tmp_path / "wide.jpg"
-    img.save(img_path, format="JPEG")
-    return img_path
+    # 2.63:1 ratio, outside max of 2.5:1
+    return make_jpeg("wide.jpg", (1000, 380), "blue")
 
 
 @pytest.fixture
-def tall_image_path(tmp_path):
+def tall_image_path(make_jpeg):
     """Create a temporary tall test image file."""
-    img = Image.new(
-        "RGB", (380, 1000), color="green"
-    )  # 1:2.63 ratio, outside min of 1:2.5
-    img_path = tmp_path / "tall.jpg"
-    img.save(img_path, format="JPEG")
-    return img_path
+    # 1:2.63 ratio, outside min of 1:2.5
+    return make_jpeg("tall.jpg", (380, 1000), "green")
 
 
 def test_validate_image_aspect_ratio_valid(test_image_path):
@@ -77,129 +130,70 @@ def test_validate_image_aspect_ratio_valid(test_image_path):
 def test_validate_image_aspect_ratio_invalid(wide_image_path, tall_image_path):
     """Test aspect ratio validation with invalid ratios."""
     # Test too wide image (2.63:1)
-    with pytest.raises(
-        ValueError,
-        match="Error processing image .* for aspect ratio validation: Image aspect ratio \\(2.63\\) is outside the allowed range \\[0.40 \\(1:2.5\\), 2.50 \\(2.5:1\\)\\]",
-    ):
+    with pytest.raises(ValueError, match=_ASPECT_TOO_WIDE):
         validate_image_aspect_ratio(wide_image_path)
 
     # Test too tall image (1:2.63)
-    with pytest.raises(
-        ValueError,
-        match="Error processing image .* for aspect ratio validation: Image aspect ratio \\(0.38\\) is outside the allowed range \\[0.40 \\(1:2.5\\), 2.50 \\(2.5:1\\)\\]",
-    ):
+    with pytest.raises(ValueError, match=_ASPECT_TOO_TALL):
         validate_image_aspect_ratio(tall_image_path)
 
     # Test with custom error message
-    custom_message = "Please use a more square image"
-    with pytest.raises(
-        ValueError,
-        match=f"Error processing image .* for aspect ratio validation: Image aspect ratio \\(2.63\\) is outside the allowed range \\[0.40 \\(1:2.5\\), 2.50 \\(2.5:1\\)\\]. {custom_message}",
-    ):
+    with pytest.raises(ValueError, match=_ASPECT_TOO_WIDE_CUSTOM):
         validate_image_aspect_ratio(
-            wide_image_path, aspect_ratio_error_message=custom_message
+            wide_image_path, aspect_ratio_error_message=_CUSTOM_ASPECT_MESSAGE
         )
 
 
-def test_validate_image_aspect_ratio_errors(tmp_path):
+def test_validate_image_aspect_ratio_crop(tmp_path):
+    """Test that out-of-range images are cropped in place when requested."""
+    # Written directly rather than via make_jpeg, which would share the inode
+    wide_path = tmp_path / "wide.jpg"
+    Image.new("RGB", (1000, 380), color="blue").save(wide_path, format="JPEG")
+
+    validate_image_aspect_ratio(wide_path, crop_to_aspect_ratio=True)
+
+    with Image.open(wide_path) as img:
+        width, height = img.size
+    assert width / height <= 2.5
+
+
+def test_validate_image_aspect_ratio_errors(tmp_path, invalid_image_path):
     """Test aspect ratio validation error cases."""
     # Test non-existent file
     non_existent = tmp_path / "nonexistent.jpg"
-    with pytest.raises(
-        ValueError,
-        match=r"Error processing image .* for aspect ratio validation: .*No such file or directory",
-    ):
+    with pytest.raises(ValueError, match=_ASPECT_MISSING_FILE):
         validate_image_aspect_ratio(non_existent)
 
     # Test invalid image file
-    invalid_file = tmp_path / "invalid.jpg"
-    invalid_file.write_text("not an image")
-    with pytest.raises(ValueError, match="Error processing image"):
-        validate_image_aspect_ratio(invalid_file)
-
-
-def test_resize_image(test_image_path):
-    """Test image resizing while maintaining aspect ratio."""
-    # Test with max_dim larger than image
-    img = resize_image(test_image_path, max_dim=2000)
-    assert img.size == (800, 600)  # Should not resize
-
-    # Test with max_dim smaller than image
-    img = resize_image(test_image_path, max_dim=400)
-    assert max(img.size) == 400
-    assert img.size[0] / img.size[1] == pytest.approx(
-        800 / 600
-    )  # Aspect ratio preserved
-
-
-def test_resize_image_with_min_dim(tmp_path):
-    """Test image resizing with min_dim parameter."""
-    # Create a small test image (200x200)
-    small_img = Image.new("RGB", (200, 200), color="red")
-    small_img_path = tmp_path / "small.jpg"
-    small_img.save(small_img_path, format="JPEG")
-
-    # Test scaling up with default min_dim (300)
-    img = resize_image(small_img_path, max_dim=1024, min_dim=300)
-    assert min(img.size) == 300  # Should scale up to meet minimum
-    assert img.size[0] / img.size[1] == pytest.approx(1.0)  # Aspect ratio preserved
-
-    # Test scaling up with custom min_dim
-    img = resize_image(small_img_path, max_dim=1024, min_dim=400)
-    assert min(img.size) == 400  # Should scale up to meet minimum
-    assert img.size[0] / img.size[1] == pytest.approx(1.0)  # Aspect ratio preserved
-
-    # Test with image already meeting min_dim (should not scale up)
-    medium_img = Image.new("RGB", (400, 400), color="blue")
-    medium_img_path = tmp_path / "medium.jpg"
-    medium_img.save(medium_img_path, format="JPEG")
-
-    img = resize_image(medium_img_path, max_dim=1024, min_dim=300)
-    assert img.size == (400, 400)  # Should not resize
-
-    # Test with rectangular image that needs scaling up
-    wide_small_img = Image.new("RGB", (150, 100), color="green")
-    wide_small_img_path = tmp_path / "wide_small.jpg"
-    wide_small_img.save(wide_small_img_path, format="JPEG")
-
-    img = resize_image(wide_small_img_path, max_dim=1024, min_dim=300)
-    assert min(img.size) == 300  # Should scale up to meet minimum
-    assert img.size[0] / img.size[1] == pytest.approx(1.5)  # Aspect ratio preserved
-
-
-def test_resize_image_priority(tmp_path):
-    """Test that max_dim takes priority over min_dim when both constraints apply."""
-    # Create a very large image (2000x1500)
-    large_img = Image.new("RGB", (2000, 1500), color="purple")
-    large_img_path = tmp_path / "large.jpg"
-    large_img.save(large_img_path, format="JPEG")
-
-    # Test with both max_dim and min_dim constraints
-    # max_dim=800 should take priority over min_dim=1000
-    img = resize_image(large_img_path, max_dim=800, min_dim=1000)
-    assert max(img.size) == 800  # Should respect max_dim
-    assert img.size[0] / img.size[1] == pytest.approx(
-        2000 / 1500
-    )  # Aspect ratio preserved
-
-    # The resulting image will be 800x600, which is less than min_dim=1000
-    # This is correct behavior as max_dim takes priority
-
-
-def test_resize_image_no_resize_needed(tmp_path):
-    """Test that images within both min_dim and max_dim bounds are not resized."""
-    # Create an image that's already within bounds (500x400)
-    medium_img = Image.new("RGB", (500, 400), color="orange")
-    medium_img_path = tmp_path / "medium.jpg"
-    medium_img.save(medium_img_path, format="JPEG")
-
-    # Test with bounds that include the current size
-    img = resize_image(medium_img_path, max_dim=1024, min_dim=300)
-    assert img.size == (500, 400)  # Should not resize
-
-    # Test with tighter bounds that still include the current size
-    img = resize_image(medium_img_path, max_dim=600, min_dim=350)
-    assert img.size == (500, 400)  # Should not resize
+    with pytest.raises(ValueError, match=_PROCESSING_ERROR):
+        validate_image_aspect_ratio(invalid_image_path)
+
+
+@pytest.mark.parametrize(
+    ("size", "max_dim", "min_dim", "expected"),
+    [
+        # Within bounds: no resize
+        ((80, 60), 200, 30, (80, 60)),
+        ((40, 40), 100, 30, (40, 40)),
+        ((50, 40), 100, 30, (50, 40)),
+        ((50, 40), 60, 35, (50, 40)),
+        # Scale down to max_dim, preserving aspect ratio
+        ((80, 60), 40, 30, (40, 30)),
+        # Scale up to min_dim, preserving aspect ratio
+        ((20, 20), 100, 30, (30, 30)),
+        ((20, 20), 100, 40, (40, 40)),
+        ((15, 10), 100, 30, (45, 30)),
+        # max_dim takes priority over min_dim when both constraints apply
+        ((200, 150), 80, 100, (80, 60)),
+    ],
+)
+def test_resize_image(encoded_jpeg, size, max_dim, min_dim, expected):
+    """Test image resizing against max_dim and min_dim bounds.
+
+    The resize logic is scale-invariant, so the cases use small images.
+    """
+    img = resize_image(encoded_jpeg(size, "red"), max_dim=max_dim, min_dim=min_dim)
+    assert img.size == expected
 
 
 def test_convert_to_supported_jpeg_mode(test_image_rgba):
@@ -255,73 +249,77 @@ def test_save_to_base64(test_image_path):
     assert png_result.startswith("data:image/png;base64,")
 
 
+def test_save_to_base64_reencodes_modified_file(test_image_path):
+    """Test that cached base64 output is refreshed when the file changes."""
+    original = save_to_base64(test_image_path)
+    assert save_to_base64(test_image_path) == original
+
+    # Replace rather than overwrite: the fixture is a shared hardlink
+    replacement = test_image_path.with_name("replacement.jpg")
+    Image.new("RGB", (800, 600), color="blue").save(replacement, format="JPEG")
+    replacement.replace(test_image_path)
+    stat = test_image_path.stat()
+    os.utime(test_image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    assert save_to_base64(test_image_path) != original
+
+
 def test_save_to_file(test_image_path, tmp_path):
     """Test saving image to file."""
-    with patch("tempfile.NamedTemporaryFile") as mock_temp:
-        mock_temp.return_value.__enter__.return_value.name = str(tmp_path / "test.jpg")
-        result = save_to_file(test_image_path)
-        assert result.suffix == ".jpg"
-        assert result.parent == tmp_path
+    tmp_factory = partial(tempfile.NamedTemporaryFile, dir=tmp_path)
+    result = save_to_file(test_image_path, tmp_factory=tmp_factory)
+    assert result.suffix == ".jpeg"
+    assert result.parent == tmp_path
 
 
-@pytest.mark.asyncio
 async def test_optimized_base64(test_image_path):
     """Test async base64 conversion."""
     result = await optimized_base64(test_image_path)
     assert result.startswith("data:image/jpeg;base64,")
 
 
-@pytest.mark.asyncio
 async def test_optimized_file(test_image_path, tmp_path):
     """Test async file saving."""
-    with patch("tempfile.NamedTemporaryFile") as mock_temp:
-        mock_temp.return_value.__enter__.return_value.name = str(tmp_path / "test.jpg")
-        result = await optimized_file(test_image_path)
-        assert result.suffix == ".jpg"
-        assert result.parent == tmp_path
+    tmp_factory = partial(tempfile.NamedTemporaryFile, dir=tmp_path)
+    result = await optimized_file(test_image_path, tmp_factory=tmp_factory)
+    assert result.suffix == ".jpeg"
+    assert result.parent == tmp_path
 
 
 def test_image_quality_and_size(test_image_path):
     """Test that image quality and size parameters are respected."""
     # Test with high quality
-    high_quality = save_to_base64(test_image_path, quality=95)
-    high_quality_size = len(base64.b64decode(high_quality.split(",")[1]))
+    high_quality = save_to_base64(test_image_path, quality=95, raw=True)
 
     # Test with low quality
-    low_quality = save_to_base64(test_image_path, quality=10)
-    low_quality_size = len(base64.b64decode(low_quality.split(",")[1]))
+    low_quality = save_to_base64(test_image_path, quality=10, raw=True)
 
-    # High quality should result in larger file size
-    assert high_quality_size > low_quality_size
+    # High quality should result in larger file size; base64 length grows
+    # monotonically with the payload, so the encoded lengths compare the same
+    assert len(high_quality) > len(low_quality)
 
 
-def test_resize_image_heic():
+@pytest.mark.network
+@pytest.mark.xdist_group("network")
+def test_resize_image_heic(heic_path):
     """Test resizing a HEIC image from URL."""
-    url = "https://replicate.delivery/pbxt/NM8ePjxU47T9cqMHFQ7xAE0Yih72FiXShCo5G8dJzq9CLLYT/IMG_1845.HEIC"
-    with tempfile.NamedTemporaryFile(suffix=".HEIC") as tmp:
-        resp = requests.get(url)
-        tmp.write(resp.content)
-        tmp.flush()
-        img = resize_image(tmp.name)
-        assert isinstance(img, Image.Image)
-        assert max(img.size) == 1024  # Default max_dim
+    img = resize_image(heic_path)
+    assert isinstance(img, Image.Image)
+    assert max(img.size) == 1024  # Default max_dim
 
-        # Test base64 conversion
-        b64 = save_to_base64(tmp.name)
-        assert b64.startswith("data:image/jpeg;base64,")
+    # Test base64 conversion
+    b64 = save_to_base64(heic_path)
+    assert b64.startswith("data:image/jpeg;base64,")
 
 
-def test_resize_image_avif():
+@pytest.mark.network
+@pytest.mark.xdist_group("network")
+def test_resize_image_avif(avif_path):
     """Test resizing an AVIF image from URL."""
-    url = "https://replicate.delivery/pbxt/NM8fUF5vdinBEBweWzwD5d94VqclSsOuYSsuqjWOiLJnLlHH/titanic.avif"
-    with tempfile.NamedTemporaryFile(suffix=".avif") as tmp:
-        resp = requests.get(url)
-        tmp.write(resp.content)
-        tmp.flush()
-        img = resize_image(tmp.name)
-        assert isinstance(img, Image.Image)
-        assert max(img.size) == 1024  # Default max_dim
-
-        # Test base64 conversion
-        b64 = save_to_base64(tmp.name)
-        assert b64.startswith("data:image/jpeg;base64,")
+    img = resize_image(avif_path)
+    assert isinstance(img, Image.Image)
+    assert max(img.size) == 1024  # Default max_dim
+
+    # Test base64 conversion
+    b64 = save_to_base64(avif_path)
+    assert b64.startswith("data:image/jpeg;base64,")
@@ -1,7 +1,9 @@
 """Tests for content moderation functionality."""
 
 import asyncio
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -11,43 +13,48 @@ from helpers.moderation.client import (
     OpenAIModerationClient,
 )
 
+# Share one event loop across the module instead of creating one per test
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+@dataclass(slots=True, frozen=True)
+class Categories:
+    harassment: bool = False
+    harassment_threatening: bool = False
+    hate: bool = False
+    hate_threatening: bool = False
+    self_harm: bool = False
+    self_harm_intent: bool = False
+    self_harm_instructions: bool = False
+    sexual: bool = False
+    sexual_minors: bool = False
+    violence: bool = False
+    violence_graphic: bool = False
+
 
 def create_mock_categories(**kwargs):
     """Create mock categories with default False values, overridden by kwargs."""
-    default_categories = {
-        "harassment": False,
-        "harassment_threatening": False,
-        "hate": False,
-        "hate_threatening": False,
-        "self_harm": False,
-        "self_harm_intent": False,
-        "self_harm_instructions": False,
-        "sexual": False,
-        "sexual_minors": False,
-        "violence": False,
-        "violence_graphic": False,
-    }
-    default_categories.update(kwargs)
-    return MagicMock(**default_categories)
+    return Categories(**kwargs)
 
 
-def create_mock_result(categories):
+def create_mock_result(categories, result_id="mod-123"):
     """Create a mock result with the given categories."""
-    return MagicMock(
-        categories=categories,
-        model_dump=lambda: {
-            "id": "mod-123",
-            "categories": {
-                k.replace("_", "/"): v for k, v in categories.__dict__.items()
-            },
-        },
-    )
+    flags = {k.replace("_", "/"): v for k, v in asdict(categories).items()}
+    dump = {
+        "id": result_id,
+        "flagged": any(flags.values()),
+        "categories": flags,
+        "category_scores": {k: 1.0 if v else 0.0 for k, v in flags.items()},
+    }
+    return SimpleNamespace(categories=categories, model_dump=lambda **_: dump)
 
 
 @pytest.fixture
 def mock_openai_client():
     """Create a mock OpenAI client."""
-    with patch("helpers.moderation.client.AsyncOpenAI") as mock:
+    with patch("helpers.moderation.client.AsyncOpenAI") as mock, patch(
+        "helpers.moderation.client._shared_client", None
+    ):
         client = MagicMock()
         mock.return_value = client
         yield client
@@ -63,6 +70,14 @@ def moderation_client(mock_openai_client):  # noqa: ARG001
     return OpenAIModerationClient()
 
 
+@pytest.fixture
+def moderations_create(mock_openai_client):
+    """Install one AsyncMock as moderations.create for the test to configure."""
+    create = AsyncMock()
+    mock_openai_client.moderations.create = create
+    return create
+
+
 @pytest.fixture
 def mock_moderation_response():
     """Create a mock moderation response with all categories set to False."""
@@ -70,137 +85,248 @@ def mock_moderation_response():
     return MagicMock(results=[create_mock_result(categories)])
 
 
-@pytest.mark.asyncio
 async def test_check_content_text(
-    moderation_client, mock_openai_client, mock_moderation_response
+    moderation_client, moderations_create, mock_moderation_response
 ):
     """Test checking text content."""
-    mock_openai_client.moderations.create = AsyncMock(
-        return_value=mock_moderation_response
-    )
+    moderations_create.return_value = mock_moderation_response
 
     result = await moderation_client.check_content(texts=["test text"])
 
     assert result["id"] == "mod-123"
-    mock_openai_client.moderations.create.assert_called_once()
+    moderations_create.assert_called_once()
 
 
-@pytest.mark.asyncio
 async def test_check_content_image_url(
-    moderation_client, mock_openai_client, mock_moderation_response
+    moderation_client, moderations_create, mock_moderation_response
 ):
     """Test checking image URL content."""
-    mock_openai_client.moderations.create = AsyncMock(
-        return_value=mock_moderation_response
-    )
+    moderations_create.return_value = mock_moderation_response
 
     result = await moderation_client.check_content(
         image_url="http://example.com/image.jpg"
     )
 
     assert result["id"] == "mod-123"
-    mock_openai_client.moderations.create.assert_called_once()
+    moderations_create.assert_called_once()
 
 
-@pytest.mark.asyncio
 async def test_check_content_image_path(
-    moderation_client, mock_openai_client, mock_moderation_response
+    moderation_client, moderations_create, mock_moderation_response
 ):
     """Test checking local image content."""
-    mock_openai_client.moderations.create = AsyncMock(
-        return_value=mock_moderation_response
-    )
+    moderations_create.return_value = mock_moderation_response
 
     with patch("helpers.moderation.client.optimized_base64") as mock_base64:
         mock_base64.return_value = "base64_image_data"
         result = await moderation_client.check_content(image_path=Path("test.jpg"))
 
     assert result["id"] == "mod-123"
-    mock_openai_client.moderations.create.assert_called_once()
+    moderations_create.assert_called_once()
 
 
-@pytest.mark.asyncio
 async def test_raise_if_flagged_clean_content(
-    moderation_client, mock_openai_client, mock_moderation_response
+    moderation_client, moderations_create, mock_moderation_response
 ):
     """Test that clean content doesn't raise an error."""
-    mock_openai_client.moderations.create = AsyncMock(
-        return_value=mock_moderation_response
-    )
+    moderations_create.return_value = mock_moderation_response
 
     await moderation_client.raise_if_flagged(
-        types=["harassment", "hate"], texts=["clean text"]
+        types=["harassment", "hate"], content_list=[{"texts": ["clean text"]}]
     )
 
 
-@pytest.mark.asyncio
-async def test_raise_if_flagged_harassment(moderation_client, mock_openai_client):
+async def test_raise_if_flagged_harassment(moderation_client, moderations_create):
     """Test that harassment content raises an error."""
     categories = create_mock_categories(harassment=True)
     response = MagicMock(results=[create_mock_result(categories)])
-    mock_openai_client.moderations.create = AsyncMock(return_value=response)
+    moderations_create.return_value = response
 
     with pytest.raises(ContentModerationError, match="Content flagged for: harassment"):
         await moderation_client.raise_if_flagged(
-            types=["harassment"], texts=["harassing text"]
+            types=["harassment"], content_list=[{"texts": ["harassing text"]}]
         )
 
 
-@pytest.mark.asyncio
-async def test_raise_if_flagged_sexual_minors(moderation_client, mock_openai_client):
+async def test_raise_if_flagged_sexual_minors(moderation_client, moderations_create):
     """Test that sexual/minors content raises a specific error."""
     categories = create_mock_categories(sexual_minors=True)
     response = MagicMock(results=[create_mock_result(categories)])
-    mock_openai_client.moderations.create = AsyncMock(return_value=response)
+    moderations_create.return_value = response
 
     with pytest.raises(
         ContentModerationError,
         match="Content flagged and reported for containing illegal material",
     ):
         await moderation_client.raise_if_flagged(
-            types=["sexual/minors"], texts=["inappropriate text"]
+            types=["sexual/minors"], content_list=[{"texts": ["inappropriate text"]}]
         )
 
 
-@pytest.mark.asyncio
 async def test_raise_if_flagged_sexual_with_other(
-    moderation_client, mock_openai_client
+    moderation_client, moderations_create
 ):
     """Test that sexual content with other violations raises an error."""
     categories = create_mock_categories(harassment=True, sexual=True)
     response = MagicMock(results=[create_mock_result(categories)])
-    mock_openai_client.moderations.create = AsyncMock(return_value=response)
+    moderations_create.return_value = response
 
     with pytest.raises(
         ContentModerationError,
         match="Content flagged for containing sexual content with other violations",
     ):
         await moderation_client.raise_if_flagged(
-            types=["sexual", "harassment"], texts=["inappropriate text"]
+            types=["sexual", "harassment"],
+            content_list=[{"texts": ["inappropriate text"]}],
         )
 
 
-@pytest.mark.asyncio
-async def test_raise_if_flagged_timeout(moderation_client, mock_openai_client):
+async def test_raise_if_flagged_timeout(moderation_client, moderations_create):
     """Test handling of timeout errors."""
-    mock_openai_client.moderations.create = AsyncMock(
-        side_effect=asyncio.TimeoutError()
-    )
+    moderations_create.side_effect = asyncio.TimeoutError()
 
-    await moderation_client.raise_if_flagged(types=["harassment"], texts=["test text"])
+    await moderation_client.raise_if_flagged(
+        types=["harassment"], content_list=[{"texts": ["test text"]}]
+    )
     # Should not raise an error, just print a warning
 
 
-@pytest.mark.asyncio
 async def test_raise_if_flagged_invalid_type(
-    moderation_client, mock_openai_client, mock_moderation_response
+    moderation_client, moderations_create, mock_moderation_response
 ):
     """Test handling of invalid moderation types."""
-    mock_openai_client.moderations.create = AsyncMock(
-        return_value=mock_moderation_response
-    )
+    moderations_create.return_value = mock_moderation_response
 
     # Should not raise an error, just print a warning
     await moderation_client.raise_if_flagged(
-        types=["invalid_type"], texts=["test text"]
+        types=["invalid_type"], content_list=[{"texts": ["test text"]}]
+    )
+
+
+async def test_check_multiple_batches_text_items(moderation_client, moderations_create):
+    """Test that text-only items share one moderation request."""
+    clean = create_mock_result(create_mock_categories())
+    flagged = create_mock_result(create_mock_categories(harassment=True))
+    response = MagicMock(results=[clean, flagged])
+    moderations_create.return_value = response
+
+    results = await moderation_client.check_multiple(
+        content_list=[{"texts": ["first"]}, {"texts": ["second"]}]
     )
+
+    moderations_create.assert_called_once()
+    _, kwargs = moderations_create.call_args
+    assert kwargs["input"] == ["first", "second"]
+    assert not results[0]["categories"]["harassment"]
+    assert results[1]["categories"]["harassment"]
+
+
+async def test_check_multiple_merges_texts_of_one_item(
+    moderation_client, moderations_create
+):
+    """Test that an item's texts are merged: any flag or max score wins."""
+    clean = create_mock_result(create_mock_categories())
+    flagged = create_mock_result(create_mock_categories(harassment=True))
+    moderations_create.return_value = MagicMock(results=[clean, flagged, clean])
+
+    results = await moderation_client.check_multiple(
+        content_list=[{"texts": ["first", "second"]}, {"texts": ["third"]}]
+    )
+
+    _, kwargs = moderations_create.call_args
+    assert kwargs["input"] == ["first", "second", "third"]
+    assert results[0]["flagged"]
+    assert results[0]["categories"]["harassment"]
+    assert results[0]["category_scores"]["harassment"] == 1.0
+    assert not results[1]["flagged"]
+    assert not results[1]["categories"]["harassment"]
+
+
+async def test_check_multiple_broadcasts_batch_failure(
+    moderation_client, moderations_create
+):
+    """Test that a failed batched request is reported for every text item."""
+    moderations_create.side_effect = RuntimeError("boom")
+
+    results = await moderation_client.check_multiple(
+        content_list=[{"texts": ["first", "second"]}, {"texts": ["third"]}]
+    )
+
+    assert len(results) == 2
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_check_multiple_keeps_order_with_images(
+    moderation_client, moderations_create
+):
+    """Test that mixed image and text items keep their input positions."""
+    image = create_mock_result(create_mock_categories(), result_id="image")
+    text_a = create_mock_result(create_mock_categories(), result_id="text-a")
+    text_b = create_mock_result(create_mock_categories(), result_id="text-b")
+
+    async def create(model, input):  # noqa: A002, ARG001
+        if isinstance(input[0], str):
+            return MagicMock(results=[text_a, text_b])
+        return MagicMock(results=[image])
+
+    moderations_create.side_effect = create
+
+    results = await moderation_client.check_multiple(
+        content_list=[
+            {"texts": ["a"]},
+            {"image_url": "http://example.com/image.jpg"},
+            {"texts": ["b"]},
+        ]
+    )
+
+    assert [result["id"] for result in results] == ["text-a", "image", "text-b"]
+    assert moderations_create.call_count == 2
+
+
+async def test_raise_if_flagged_substitutes_child_terms(
+    moderation_client, moderations_create, mock_moderation_response
+):
+    """Test that child terms are annotated before moderation."""
+    moderations_create.return_value = mock_moderation_response
+    content_list = [{"texts": ["a girl and a boy", "a cat"]}]
+
+    await moderation_client.raise_if_flagged(
+        content_list=content_list, substitute_child_terms=True
+    )
+
+    assert content_list[0]["texts"] == ["a girl (child) and a boy (child)", "a cat"]
+
+
+async def test_clients_share_openai_client(mock_openai_client):
+    """Test that moderation clients reuse one OpenAI client."""
+    first = OpenAIModerationClient()
+    second = OpenAIModerationClient()
+
+    assert first.client is mock_openai_client
+    assert second.client is first.client
+
+
+async def test_client_outside_event_loop_raises(mock_openai_client):  # noqa: ARG001
+    """Test that reading the client outside an event loop fails clearly."""
+    with pytest.raises(RuntimeError, match="running event loop"):
+        # Worker threads have no running loop
+        await asyncio.to_thread(lambda: OpenAIModerationClient().client)
+
+
+async def test_loop_change_closes_previous_client():
+    """Test that switching event loops closes the client of the old loop."""
+    first, second = MagicMock(close=AsyncMock()), MagicMock(close=AsyncMock())
+
+    async def get_client():
+        return OpenAIModerationClient().client
+
+    with patch(
+        "helpers.moderation.client.AsyncOpenAI", side_effect=[first, second]
+    ), patch("helpers.moderation.client._shared_client", None):
+        # First client is created on a separate, short-lived loop
+        assert await asyncio.to_thread(asyncio.run, get_client()) is first
+        assert await get_client() is second
+        await OpenAIModerationClient.aclose()
+
+    first.close.assert_awaited_once()
+    second.close.assert_awaited_once()
@@ -58,6 +58,8 @@ def test_model_error_messages():
         ("Internal server error occurred", ErrorCode.SERVICE_UNAVAILABLE),
         ("Content flagged as NSFW", ErrorCode.MODERATION_CONTENT),
         ("Output blocked by risk control", ErrorCode.MODERATION_CONTENT),
+        # Earlier error codes win even when a later pattern appears first
+        ("429: billing hard limit reached", ErrorCode.INSUFFICIENT_CREDITS),
     ],
 )
 def test_check_for_prediction_error_patterns(error_message, expected_code):
@@ -1,6 +1,6 @@
 """Tests for random utility functions."""
 
-from helpers.utils.random import seed_or_random_seed
+from helpers.utils.random_utils import seed_or_random_seed
 
 
 def test_valid_seed():
@@ -1,39 +1,74 @@
 import pytest
 
-from helpers.utils.validation import validate_url
+from helpers.utils.validation import ValidatedUrl, validate_url, validate_urls
 
 
-def test_validate_url_valid():
+@pytest.mark.parametrize(
+    "url",
+    [
+        # HTTP URLs
+        "http://example.com",
+        "http://example.com/path",
+        "http://example.com:8080/path",
+        # HTTPS URLs
+        "https://example.com",
+        "https://example.com/path",
+        "https://example.com:8080/path",
+    ],
+)
+def test_validate_url_valid(url):
     """Test that valid URLs pass validation."""
-    # Test HTTP URLs
-    validate_url("test", "http://example.com")
-    validate_url("test", "http://example.com/path")
-    validate_url("test", "http://example.com:8080/path")
+    validated = validate_url("test", url)
+    assert isinstance(validated, ValidatedUrl)
+    assert validated == url
+    # Already-validated URLs are returned as is
+    assert validate_url("test", validated) is validated
 
-    # Test HTTPS URLs
-    validate_url("test", "https://example.com")
-    validate_url("test", "https://example.com/path")
-    validate_url("test", "https://example.com:8080/path")
 
-
-def test_validate_url_invalid():
+@pytest.mark.parametrize(
+    ("url", "message"),
+    [
+        # Missing protocol
+        ("example.com", "must start with http:// or https://"),
+        # Invalid format
+        ("http://", "Invalid URL format"),
+        ("http:///path", "Invalid URL format"),
+        # Invalid characters in host
+        ("http://example.com/\x00", "Invalid non-printable ASCII character in URL"),
+        # Hosts urlsplit accepts but httpx rejects
+        ("https://a\u200b.com", "Invalid IDNA hostname"),
+        ("http://example.com\xa0", "Invalid IDNA hostname"),
+        ("http://\u2028", "Invalid IDNA hostname"),
+        ("http://\u2013.com", "Invalid IDNA hostname"),
+    ],
+)
+def test_validate_url_invalid(url, message):
     """Test that invalid URLs raise ValueError."""
-    # Missing protocol
-    with pytest.raises(ValueError, match="must start with http:// or https://"):
-        validate_url("test", "example.com")
+    with pytest.raises(ValueError) as exc_info:
+        validate_url("test", url)
+    assert message in str(exc_info.value)
 
-    # Invalid format
-    with pytest.raises(ValueError, match="Invalid URL format"):
-        validate_url("test", "http://")
 
-    # Invalid characters in host
-    with pytest.raises(
-        ValueError, match="Invalid non-printable ASCII character in URL"
-    ):
-        validate_url("test", "http://example.com/\x00")
+@pytest.mark.parametrize("url", [None, ""])
+def test_validate_url_empty(url):
+    """Test that empty or None URLs are allowed."""
+    assert validate_url("test", url) is None
 
 
-def test_validate_url_empty():
-    """Test that empty or None URLs are allowed."""
-    validate_url("test", None)
-    validate_url("test", "")
+def test_validate_url_invalid_raises_on_every_call():
+    """Test that cached validation still raises, with the caller's label."""
+    with pytest.raises(ValueError) as exc_info:
+        validate_url("first", "example.com")
+    assert str(exc_info.value).startswith("first must start with")
+    with pytest.raises(ValueError) as exc_info:
+        validate_url("second", "example.com")
+    assert str(exc_info.value).startswith("second must start with")
+
+
+def test_validate_urls():
+    """Test that batch validation accepts valid URLs and raises on bad ones."""
+    validate_urls("test", ["http://example.com", None, "https://example.com/path"])
+
+    with pytest.raises(ValueError) as exc_info:
+        validate_urls("test", ["http://example.com", "example.com"])
+    assert "must start with http:// or https://" in str(exc_info.value)